@@ -36,6 +36,12 @@ class S111Converter:
         else:
             hdf5_files = glob('{}/*.h5'.format(input_path))
 
+        # Spatial reference and driver are the same for every output GeoTIFF
+        srs = osr.SpatialReference()
+        srs.SetWellKnownGeogCS('WGS84')
+        srs_wkt = srs.ExportToWkt()
+        driver = gdal.GetDriverByName('GTiff')
+
         for file in hdf5_files:
             with h5py.File(file, 'r') as h5_file:
                 # Read S111 HDF5 feature instance, attributes and values
@@ -45,35 +51,34 @@ class S111Converter:
                 filename = os.path.splitext(split_path[1])
                 fillvalue = float(h5_file['Group_F']['SurfaceCurrent']['fillValue'][0])
 
+                # Set Geospatial Information, shared by every group in the file
+                geoTransform = []
+                for i in range(6):
+                    geoTransform.append(0.0)
+                geoTransform[0] = feature_instance.attrs['gridOriginLongitude']
+                geoTransform[1] = feature_instance.attrs['gridSpacingLongitudinal']
+                geoTransform[2] = 0
+                geoTransform[3] = feature_instance.attrs['gridOriginLatitude']
+                geoTransform[4] = 0
+                geoTransform[5] = feature_instance.attrs['gridSpacingLatitudinal']
+
                 for idx in range(1, num_grp + 1):
-                    values = feature_instance['Group_{:03d}/values'.format(idx)]
+                    group = feature_instance['Group_{:03d}'.format(idx)]
+                    # Read the compound dataset once, rather than once per field
+                    values = group['values'][()]
                     speed = values['surfaceCurrentSpeed']
                     direction = values['surfaceCurrentDirection']
-                    datetime = feature_instance['Group_{:03d}'.format(idx)].attrs['timePoint'][0:16]
+                    datetime = group.attrs['timePoint'][0:16]
 
                     # Set image size
                     x_dim = speed.shape[1]
                     y_dim = speed.shape[0]
 
-                    # Set Geospatial Information
-                    geoTransform = []
-                    for i in range(6):
-                        geoTransform.append(0.0)
-                    geoTransform[0] = feature_instance.attrs['gridOriginLongitude']
-                    geoTransform[1] = feature_instance.attrs['gridSpacingLongitudinal']
-                    geoTransform[2] = 0
-                    geoTransform[3] = feature_instance.attrs['gridOriginLatitude']
-                    geoTransform[4] = 0
-                    geoTransform[5] = feature_instance.attrs['gridSpacingLatitudinal']
-
-                    srs = osr.SpatialReference()
-                    srs.SetWellKnownGeogCS('WGS84')
-
                     num_bands = 2
                     name = '{}{}_{}.tif'.format(output_path, filename[0], datetime)
-                    new_dataset = gdal.GetDriverByName('GTiff').Create(name, x_dim, y_dim, num_bands, gdal.GDT_Float32)
+                    new_dataset = driver.Create(name, x_dim, y_dim, num_bands, gdal.GDT_Float32)
                     new_dataset.SetGeoTransform(geoTransform)
-                    new_dataset.SetProjection(srs.ExportToWkt())
+                    new_dataset.SetProjection(srs_wkt)
 
                     new_dataset.GetRasterBand(1).WriteArray(speed)
                     new_dataset.GetRasterBand(1).SetDescription('speed')
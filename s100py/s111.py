@@ -3,8 +3,10 @@
 S-111 is an IHO standard outlining formats for storing and sending surface
 water current data and metadata.
 """
+import bisect
 import contextlib
 import datetime
+import functools
 import os
 import numpy
 import warnings
@@ -22,6 +24,39 @@ FILLVALUE = -9999.0
 # Default depth in meters
 DEFAULT_TARGET_DEPTH = 4.5
 
+# Target size in bytes of each HDF5 chunk of values and positioning datasets,
+# large enough for gzip to compress well while still fitting the default
+# (1 MB) HDF5 chunk cache
+CHUNK_TARGET_BYTES = 1024 * 1024
+
+# WGS 84 realization (epoch) names and the month (YYYYMM) each came into use,
+# dates before the first realization use 'TRANSIT'
+WGS84_EPOCH_START_DATES = (199406, 199706, 200201, 201202, 201310)
+WGS84_EPOCH_NAMES = ('TRANSIT', 'G730', 'G873', 'G1150', 'G1674', 'G1762')
+
+# S-111 date-time format used for time point attributes and file names
+DATETIME_FORMAT = '%Y%m%dT%H%M%SZ'
+
+# Variable-length string data type used for S-111 string attributes/datasets
+VLEN_STR_DTYPE = h5py.special_dtype(vlen=str)
+
+# Group_F feature information fields, in the order they are written, and the
+# matching compound data type
+GROUP_F_FIELDS = ('code', 'name', 'uom.name', 'fillValue', 'dataType', 'lower', 'upper', 'closure')
+GROUP_F_DTYPE = numpy.dtype([(field, VLEN_STR_DTYPE) for field in GROUP_F_FIELDS])
+
+# Compound data types for feature instance uncertainty, speed/direction values
+# and positioning datasets
+UNCERTAINTY_DTYPE = numpy.dtype([('name', VLEN_STR_DTYPE), ('value', numpy.float32)])
+VALUES_DTYPE = numpy.dtype([('surfaceCurrentSpeed', numpy.float32), ('surfaceCurrentDirection', numpy.float32)])
+GEOMETRY_DTYPE = numpy.dtype([('longitude', numpy.float32), ('latitude', numpy.float32)])
+
+# Horizontal axis names written to the feature type axisNames dataset
+AXIS_NAMES = ('longitude', 'latitude')
+
+# Feature codes written to the Group_F featureCode dataset
+FEATURE_CODES = ('SurfaceCurrent',)
+
 # Dict lookup for HDF5 data type class names
 # See https://github.com/h5py/h5py/blob/master/h5py/api_types_hdf5.pxd#L509
 H5T_CLASS_T = {
@@ -39,6 +74,77 @@ H5T_CLASS_T = {
     h5py.h5t.ARRAY: 'H5T_ARRAY'
 }
 
+# Group_F feature information rows for surface current speed and direction,
+# with values in GROUP_F_FIELDS order
+GROUP_F_FEATURE_INFORMATION = (
+    ('surfaceCurrentSpeed', 'Surface current speed', 'knots', str(FILLVALUE),
+     H5T_CLASS_T[h5py.h5t.FLOAT], '0.0', '', 'geSemiInterval'),
+    ('surfaceCurrentDirection', 'Surface current direction', 'arc-degrees', str(FILLVALUE),
+     H5T_CLASS_T[h5py.h5t.FLOAT], '0.0', '360', 'geLtInterval'),
+)
+
+# Feature instance uncertainty rows (name, value), -1.0 meaning unknown
+FEATURE_INSTANCE_UNCERTAINTY = (
+    ('surfaceCurrentSpeed', -1.0),
+    ('surfaceCurrentDirection', -1.0),
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _chunking_to_str(chunks):
+    """Format an HDF5 chunk shape tuple as an encoded comma-separated string.
+
+    Subgrid output produces many files with identical chunk shapes, so the
+    encoded strings are cached and reused for every chunking attribute.
+
+    Args:
+        chunks: Tuple of chunk dimensions, as reported by ``h5py.Dataset.chunks``.
+    """
+    return numpy.bytes_(','.join(map(str, chunks)))
+
+
+@functools.lru_cache(maxsize=64)
+def _enum_dtype_from_items(items):
+    """Build an HDF5 enumeration data type from a tuple of (name, value) pairs."""
+    return h5py.special_dtype(enum=(numpy.uint8, dict(items)))
+
+
+def _enum_dtype(lookup):
+    """Get the HDF5 enumeration data type for an ``S111Metadata`` lookup dict.
+
+    Data types are cached by the lookup's contents, so a metadata subclass
+    (or instance) overriding a lookup gets a data type matching its own values.
+
+    Args:
+        lookup: Dict mapping enumeration names to integer values.
+    """
+    return _enum_dtype_from_items(tuple(lookup.items()))
+
+
+@functools.lru_cache(maxsize=256)
+def _chunk_shape(shape, itemsize):
+    """Compute an HDF5 chunk shape of about ``CHUNK_TARGET_BYTES``.
+
+    Dimensions are filled starting from the last (fastest varying) one, so
+    chunks span whole rows of a grid, matching how values are written and
+    read, and are only split along a row when a single row exceeds the target.
+
+    Args:
+        shape: Tuple of dataset dimensions.
+        itemsize: Size in bytes of one dataset element.
+
+    Returns:
+        Tuple of chunk dimensions, one per dataset dimension.
+    """
+    target_items = max(1, CHUNK_TARGET_BYTES // itemsize)
+    chunks = []
+    for dim in reversed(shape):
+        size = max(1, min(dim, target_items))
+        chunks.append(size)
+        target_items = max(1, target_items // size)
+
+    return tuple(reversed(chunks))
+
 
 class S111File:
     """Create and manage S-111 files.
@@ -73,6 +179,12 @@ class S111File:
             metadata.
         groupF_dset: Handle to the underlying ``h5py.Dataset`` for Group_F 
             metadata.
+        min_dataset_speed: Minimum current speed of all data added so far,
+            kept in memory so it need not be read back from the file each
+            time data is added.
+        max_dataset_speed: Maximum current speed of all data added so far.
+        group_datetimes: List of ``datetime.datetime`` valid times of the
+            groups added through this instance, in the order they were added.
     """
 
     def __init__(self, path, input_metadata, data_coding_format, model_index=None, subgrid_index=None, clobber=False):
@@ -105,6 +217,11 @@ class S111File:
         self.input_metadata = input_metadata
         self.data_coding_format = data_coding_format
         self.subgrid_index = subgrid_index
+        self.feature_instance_groups = None
+        self.min_dataset_speed = None
+        self.max_dataset_speed = None
+        self.group_datetimes = []
+        self._values_buffer = None
 
         if not os.path.exists(self.path) or clobber:
             # File doesn't exist, open in create (write) mode and add metadata
@@ -114,7 +231,6 @@ class S111File:
             self.groupF = self.h5_file.create_group('Group_F')
             self.feature = self.h5_file.create_group('SurfaceCurrent')
             self.feature_instance = self.feature.create_group('SurfaceCurrent.01')
-            self.feature_instance_groups = None
             self.groupF_dset = None
 
             # Add feature content
@@ -129,6 +245,18 @@ class S111File:
             # File already exists, open in append mode
             self.h5_file = h5py.File(self.path, 'r+')
 
+            # Bind handles to the existing s111 structure rather than
+            # recreating it, so data can be appended to the reopened file
+            for object_path in ('Group_F/SurfaceCurrent', 'SurfaceCurrent/SurfaceCurrent.01'):
+                if object_path not in self.h5_file:
+                    self.h5_file.close()
+                    raise Exception('Existing file [{}] is missing S-111 object [{}]'.format(self.path, object_path))
+
+            self.groupF = self.h5_file['Group_F']
+            self.feature = self.h5_file['SurfaceCurrent']
+            self.feature_instance = self.feature['SurfaceCurrent.01']
+            self.groupF_dset = self.groupF['SurfaceCurrent']
+
     def __enter__(self):
         return self
 
@@ -148,63 +276,24 @@ class S111File:
         in the data product and a reference to the name.
         """
         # Add a feature name compound dataset
-        dtype = numpy.dtype([('code', h5py.special_dtype(vlen=str)),
-                             ('name', h5py.special_dtype(vlen=str)),
-                             ('uom.name', h5py.special_dtype(vlen=str)),
-                             ('fillValue', h5py.special_dtype(vlen=str)),
-                             ('dataType', h5py.special_dtype(vlen=str)),
-                             ('lower', h5py.special_dtype(vlen=str)),
-                             ('upper', h5py.special_dtype(vlen=str)),
-                             ('closure', h5py.special_dtype(vlen=str))])
-
-        fdata = numpy.zeros((2,), dtype=dtype)
-        fdata['code'][0] = 'surfaceCurrentSpeed'
-        fdata['name'][0] = 'Surface current speed'
-        fdata['uom.name'][0] = 'knots'
-        fdata['fillValue'][0] = str(FILLVALUE)
-        fdata['dataType'][0] = H5T_CLASS_T[h5py.h5t.FLOAT]
-        fdata['lower'][0] = 0.0
-        fdata['upper'][0] = ''
-        fdata['closure'][0] = 'geSemiInterval'
-
-        fdata['code'][1] = 'surfaceCurrentDirection'
-        fdata['name'][1] = 'Surface current direction'
-        fdata['uom.name'][1] = 'arc-degrees'
-        fdata['fillValue'][1] = str(FILLVALUE)
-        fdata['dataType'][1] = H5T_CLASS_T[h5py.h5t.FLOAT]
-        fdata['lower'][1] = 0.0
-        fdata['upper'][1] = 360
-        fdata['closure'][1] = 'geLtInterval'
-
-        self.groupF_dset = self.groupF.create_dataset('SurfaceCurrent', (2,), dtype=dtype)
-        self.groupF_dset[...] = fdata
+        fdata = numpy.array(list(GROUP_F_FEATURE_INFORMATION), dtype=GROUP_F_DTYPE)
+        self.groupF_dset = self.groupF.create_dataset('SurfaceCurrent', data=fdata, dtype=GROUP_F_DTYPE)
 
         # Add a feature code dataset
-        fc_data = numpy.zeros((1,), dtype=h5py.special_dtype(vlen=str))
-        fc_data[0] = 'SurfaceCurrent'
-        feature_code = self.groupF.create_dataset('featureCode', (1,), dtype=h5py.special_dtype(vlen=str))
-        feature_code[...] = fc_data
+        self.groupF.create_dataset('featureCode', data=numpy.array(FEATURE_CODES, dtype=VLEN_STR_DTYPE),
+                                   dtype=VLEN_STR_DTYPE)
 
     def add_feature_type_content(self):
         """Add feature type content to the S111 file."""
         # Add horizontal and vertical axis names in feature type
-        axis_names = numpy.zeros((2,), dtype=h5py.special_dtype(vlen=str))
-        axis_names[0] = 'longitude'
-        axis_names[1] = 'latitude'
-        axis_dset = self.feature.create_dataset('axisNames', (2,), dtype=h5py.special_dtype(vlen=str))
-        axis_dset[...] = axis_names
+        self.feature.create_dataset('axisNames', data=numpy.array(AXIS_NAMES, dtype=VLEN_STR_DTYPE),
+                                    dtype=VLEN_STR_DTYPE)
 
     def add_feature_instance_content(self):
         """Add feature instance content to the S111 file."""
         # Add feature instance uncertainty compound dataset
-        u_dtype = numpy.dtype([('name', h5py.special_dtype(vlen=str)), ('value', numpy.float32)])
-        u_data = numpy.zeros((2,), u_dtype)
-        u_data['name'][0] = 'surfaceCurrentSpeed'
-        u_data['name'][1] = 'surfaceCurrentDirection'
-        u_data['value'][0] = -1.0
-        u_data['value'][1] = -1.0
-        uncertainty_data = self.feature_instance.create_dataset('uncertainty', (2,), u_dtype)
-        uncertainty_data[...] = u_data
+        u_data = numpy.array(list(FEATURE_INSTANCE_UNCERTAINTY), dtype=UNCERTAINTY_DTYPE)
+        self.feature_instance.create_dataset('uncertainty', data=u_data, dtype=UNCERTAINTY_DTYPE)
 
     def add_metadata(self):
         """Add metadata.
@@ -212,24 +301,30 @@ class S111File:
         Based on grid properties, s111 metadata, and input metadata.
         """
 
-        metadata_xml_reference = numpy.string_('MD_{}.XML'.format(os.path.splitext(self.filename)[0]))
+        # Bind attribute managers once, h5py creates a new one on every ``.attrs`` access
+        file_attrs = self.h5_file.attrs
+        feature_attrs = self.feature.attrs
+        instance_attrs = self.feature_instance.attrs
+        input_metadata = self.input_metadata
+
+        metadata_xml_reference = numpy.bytes_('MD_{}.XML'.format(os.path.splitext(self.filename)[0]))
 
         # Add carrier metadata
-        self.h5_file.attrs.create('depthTypeIndex', self.input_metadata.DEPTH_TYPE_INDEX['Sea surface'], dtype=h5py.special_dtype(enum=(numpy.uint8, self.input_metadata.DEPTH_TYPE_INDEX)))
-        self.h5_file.attrs.create('metadata', metadata_xml_reference, dtype=h5py.special_dtype(vlen=str))
-        self.h5_file.attrs.create('horizontalDatumValue', self.input_metadata.HORIZONTAL_DATUM_VALUE, dtype=numpy.int32)
-        self.h5_file.attrs.create('geographicIdentifier', self.input_metadata.region, dtype=h5py.special_dtype(vlen=str))
-        self.h5_file.attrs.create('productSpecification', self.input_metadata.PRODUCT_SPECIFICATION, dtype=h5py.special_dtype(vlen=str))
-        self.h5_file.attrs.create('horizontalDatumReference', self.input_metadata.HORIZONTAL_DATUM_REFERENCE, dtype=h5py.special_dtype(vlen=str))
+        file_attrs.create('depthTypeIndex', input_metadata.DEPTH_TYPE_INDEX['Sea surface'], dtype=_enum_dtype(input_metadata.DEPTH_TYPE_INDEX))
+        file_attrs.create('metadata', metadata_xml_reference, dtype=VLEN_STR_DTYPE)
+        file_attrs.create('horizontalDatumValue', input_metadata.HORIZONTAL_DATUM_VALUE, dtype=numpy.int32)
+        file_attrs.create('geographicIdentifier', input_metadata.region, dtype=VLEN_STR_DTYPE)
+        file_attrs.create('productSpecification', input_metadata.PRODUCT_SPECIFICATION, dtype=VLEN_STR_DTYPE)
+        file_attrs.create('horizontalDatumReference', input_metadata.HORIZONTAL_DATUM_REFERENCE, dtype=VLEN_STR_DTYPE)
 
         # Add feature container metadata
-        self.feature.attrs.create('methodCurrentsProduct', self.input_metadata.product, dtype=h5py.special_dtype(vlen=str))
-        self.feature.attrs.create('dataCodingFormat', self.data_coding_format, dtype=h5py.special_dtype(enum=(numpy.uint8, self.input_metadata.DATA_CODING_FORMAT)))
-        self.feature.attrs.create('commonPointRule', self.input_metadata.COMMON_POINT_RULE['high'], dtype=h5py.special_dtype(enum=(numpy.uint8, self.input_metadata.COMMON_POINT_RULE)))
-        self.feature.attrs.create('typeOfCurrentData', self.input_metadata.current_datatype, dtype=h5py.special_dtype(enum=(numpy.uint8, self.input_metadata.TYPE_OF_CURRENT_DATA)))
-        self.feature.attrs.create('horizontalPositionUncertainty', -1.0, dtype=numpy.float32)
-        self.feature.attrs.create('verticalUncertainty', -1.0, dtype=numpy.float32)
-        self.feature.attrs.create('timeUncertainty', -1.0, dtype=numpy.float32)
+        feature_attrs.create('methodCurrentsProduct', input_metadata.product, dtype=VLEN_STR_DTYPE)
+        feature_attrs.create('dataCodingFormat', self.data_coding_format, dtype=_enum_dtype(input_metadata.DATA_CODING_FORMAT))
+        feature_attrs.create('commonPointRule', input_metadata.COMMON_POINT_RULE['high'], dtype=_enum_dtype(input_metadata.COMMON_POINT_RULE))
+        feature_attrs.create('typeOfCurrentData', input_metadata.current_datatype, dtype=_enum_dtype(input_metadata.TYPE_OF_CURRENT_DATA))
+        feature_attrs.create('horizontalPositionUncertainty', -1.0, dtype=numpy.float32)
+        feature_attrs.create('verticalUncertainty', -1.0, dtype=numpy.float32)
+        feature_attrs.create('timeUncertainty', -1.0, dtype=numpy.float32)
 
         if self.data_coding_format == 2:
 
@@ -259,35 +354,20 @@ class S111File:
                 max_lat = numpy.nanmax(self.model_index.var_y)
 
             # X/Y coordinates are located at the center of each grid cell
-            min_lon = numpy.round(min_lon, 7)
-            max_lon = numpy.round(max_lon, 7)
-            min_lat = numpy.round(min_lat, 7)
-            max_lat = numpy.round(max_lat, 7)
-
-            # Add carrier metadata
-            self.h5_file.attrs.create('westBoundLongitude', min_lon, dtype=numpy.float32)
-            self.h5_file.attrs.create('eastBoundLongitude', max_lon, dtype=numpy.float32)
-            self.h5_file.attrs.create('southBoundLatitude', min_lat, dtype=numpy.float32)
-            self.h5_file.attrs.create('northBoundLatitude', max_lat, dtype=numpy.float32)
+            min_lon, max_lon, min_lat, max_lat = self._add_bounding_box(min_lon, max_lon, min_lat, max_lat)
 
             # Add feature container metadata
-            self.feature.attrs.create('sequencingRule.scanDirection', self.input_metadata.SEQUENCING_RULE_SCAN_DIRECTION, dtype=h5py.special_dtype(vlen=str))
-            self.feature.attrs.create('sequencingRule.type', self.input_metadata.SEQUENCING_RULE_TYPE['linear'], dtype=h5py.special_dtype(enum=(numpy.uint8, self.input_metadata.SEQUENCING_RULE_TYPE)))
+            feature_attrs.create('sequencingRule.scanDirection', input_metadata.SEQUENCING_RULE_SCAN_DIRECTION, dtype=VLEN_STR_DTYPE)
+            feature_attrs.create('sequencingRule.type', input_metadata.SEQUENCING_RULE_TYPE['linear'], dtype=_enum_dtype(input_metadata.SEQUENCING_RULE_TYPE))
 
             # Add feature instance metadata
-            self.feature_instance.attrs.create('startSequence', self.input_metadata.START_SEQUENCE, dtype=h5py.special_dtype(vlen=str))
-            self.feature_instance.attrs.create('gridOriginLongitude', min_lon, dtype=numpy.float32)
-            self.feature_instance.attrs.create('gridOriginLatitude', min_lat, dtype=numpy.float32)
-            self.feature_instance.attrs.create('gridSpacingLongitudinal', cellsize_x, dtype=numpy.float32)
-            self.feature_instance.attrs.create('gridSpacingLatitudinal', cellsize_y, dtype=numpy.float32)
-            self.feature_instance.attrs.create('numPointsLongitudinal', num_points_lon, dtype=numpy.int32)
-            self.feature_instance.attrs.create('numPointsLatitudinal', num_points_lat, dtype=numpy.int32)
-
-            # Add feature instance metadata
-            self.feature_instance.attrs.create('westBoundLongitude', min_lon, dtype=numpy.float32)
-            self.feature_instance.attrs.create('eastBoundLongitude', max_lon, dtype=numpy.float32)
-            self.feature_instance.attrs.create('southBoundLatitude', min_lat, dtype=numpy.float32)
-            self.feature_instance.attrs.create('northBoundLatitude', max_lat, dtype=numpy.float32)
+            instance_attrs.create('startSequence', input_metadata.START_SEQUENCE, dtype=VLEN_STR_DTYPE)
+            instance_attrs.create('gridOriginLongitude', min_lon, dtype=numpy.float32)
+            instance_attrs.create('gridOriginLatitude', min_lat, dtype=numpy.float32)
+            instance_attrs.create('gridSpacingLongitudinal', cellsize_x, dtype=numpy.float32)
+            instance_attrs.create('gridSpacingLatitudinal', cellsize_y, dtype=numpy.float32)
+            instance_attrs.create('numPointsLongitudinal', num_points_lon, dtype=numpy.int32)
+            instance_attrs.create('numPointsLatitudinal', num_points_lat, dtype=numpy.int32)
 
     def add_feature_instance_group_data(self, datetime_value, speed, direction, cycletime, target_depth):
         """Add data to the S111 file.
@@ -305,14 +385,18 @@ class S111File:
                 Must be greater than or equal to 0. For areas shallower than the
                 target depth, half the water column height is used instead.
         """
-        # Create a list of all feature instance objects and groups
-        feature_instance_objs = []
-        self.feature_instance.visit(feature_instance_objs.append)
-        self.feature_instance_groups = [obj for obj in feature_instance_objs if
-                                        isinstance(self.feature_instance[obj], h5py.Group)]
+        # Create a list of all feature instance groups the first time data is
+        # added, afterwards new groups are appended as they are created
+        if self.feature_instance_groups is None:
+            # Groups only ever hold datasets, so only direct children need listing
+            self.feature_instance_groups = [name for name, obj in self.feature_instance.items() if
+                                            isinstance(obj, h5py.Group)]
+
+        feature_attrs = self.feature.attrs
+        instance_attrs = self.feature_instance.attrs
 
         # Convert time value to string
-        time_str = datetime_value.strftime('%Y%m%dT%H%M%SZ')
+        time_str = datetime_value.strftime(DATETIME_FORMAT)
 
         # Format speed and get attributes
         min_speed = numpy.nanmin(speed)
@@ -321,85 +405,106 @@ class S111File:
         max_speed = numpy.round(max_speed, decimals=2)
 
         # Create feature instance groups
-        if len(self.feature_instance_groups) == 0:
-            self.feature.attrs.create('numInstances', len(self.feature_instance), dtype=numpy.int32)
+        first_group = len(self.feature_instance_groups) == 0
+        if first_group:
+            feature_attrs.create('numInstances', len(self.feature_instance), dtype=numpy.int32)
             feature_group = self.feature_instance.create_group('Group_001')
+            self.feature_instance_groups.append('Group_001')
 
             # Time attributes updated once
-            self.feature_instance.attrs.create('dateTimeOfFirstRecord', numpy.string_(time_str), dtype=h5py.special_dtype(vlen=str))
-            self.feature_instance.attrs.create('dateTimeOfLastRecord', numpy.string_(time_str), dtype=h5py.special_dtype(vlen=str))
-            self.feature_instance.attrs.create('timeRecordInterval', 0, dtype=numpy.int32)
+            instance_attrs.create('dateTimeOfFirstRecord', numpy.bytes_(time_str), dtype=VLEN_STR_DTYPE)
+            instance_attrs.create('dateTimeOfLastRecord', numpy.bytes_(time_str), dtype=VLEN_STR_DTYPE)
+            instance_attrs.create('timeRecordInterval', 0, dtype=numpy.int32)
 
             # Add initial speed attributes
-            self.feature.attrs.create('minDatasetCurrentSpeed', min_speed, dtype=numpy.float32)
-            self.feature.attrs.create('maxDatasetCurrentSpeed', max_speed, dtype=numpy.float32)
-
-            feature_instance_date = int(cycletime.strftime('%Y%m'))
-
-            if feature_instance_date < 199406:
-                epoch = 'TRANSIT'
-            elif feature_instance_date < 199706:
-                epoch = 'G730'
-            elif feature_instance_date < 200201:
-                epoch = 'G873'
-            elif feature_instance_date < 201202:
-                epoch = 'G1150'
-            elif feature_instance_date < 201310:
-                epoch = 'G1674'
-            elif feature_instance_date >= 201310:
-                epoch = 'G1762'
-
-            self.h5_file.attrs.create('epoch', epoch, dtype=h5py.special_dtype(vlen=str))
+            self.min_dataset_speed = min_speed
+            self.max_dataset_speed = max_speed
+            feature_attrs.create('minDatasetCurrentSpeed', min_speed, dtype=numpy.float32)
+            feature_attrs.create('maxDatasetCurrentSpeed', max_speed, dtype=numpy.float32)
+
+            feature_instance_date = cycletime.year * 100 + cycletime.month
+            epoch = WGS84_EPOCH_NAMES[bisect.bisect_right(WGS84_EPOCH_START_DATES, feature_instance_date)]
+
+            self.h5_file.attrs.create('epoch', epoch, dtype=VLEN_STR_DTYPE)
 
         else:
             # num_groups is 0-based
             num_groups = len(self.feature_instance_groups)
             add_group = num_groups + 1
-            feature_group = self.feature_instance.create_group('Group_{:03d}'.format(add_group))
-            self.feature_instance.attrs.modify('dateTimeOfLastRecord', numpy.string_(time_str))
-
-            # Update speed attributes each time data is added
-            prior_min_speed = self.feature.attrs['minDatasetCurrentSpeed']
-            prior_max_speed = self.feature.attrs['maxDatasetCurrentSpeed']
-            if min_speed < prior_min_speed:
-                self.feature.attrs.modify('minDatasetCurrentSpeed', min_speed)
-            if max_speed > prior_max_speed:
-                self.feature.attrs.modify('maxDatasetCurrentSpeed', max_speed)
+            group_name = 'Group_{:03d}'.format(add_group)
+            feature_group = self.feature_instance.create_group(group_name)
+            self.feature_instance_groups.append(group_name)
+            instance_attrs.modify('dateTimeOfLastRecord', numpy.bytes_(time_str))
+
+            # Update speed attributes when data added extends the speed range,
+            # for a file opened in append mode the prior range is read once
+            if self.min_dataset_speed is None:
+                self.min_dataset_speed = feature_attrs['minDatasetCurrentSpeed']
+                self.max_dataset_speed = feature_attrs['maxDatasetCurrentSpeed']
+            if min_speed < self.min_dataset_speed:
+                self.min_dataset_speed = min_speed
+                feature_attrs.modify('minDatasetCurrentSpeed', min_speed)
+            if max_speed > self.max_dataset_speed:
+                self.max_dataset_speed = max_speed
+                feature_attrs.modify('maxDatasetCurrentSpeed', max_speed)
+
+        self.group_datetimes.append(datetime_value)
 
         # Add time string to feature instance group compound dataset
-        feature_group.attrs.create('timePoint', numpy.string_(time_str), None, h5py.special_dtype(vlen=str))
+        feature_group.attrs.create('timePoint', numpy.bytes_(time_str), None, VLEN_STR_DTYPE)
 
         # Add speed and direction data to feature instance group compound dataset
-        values_dtype = numpy.dtype([('surfaceCurrentSpeed', numpy.float32), ('surfaceCurrentDirection', numpy.float32)])
-
         # Check if numpy array is masked
         # If numpy array is masked remove nan values
+        # filled() only returns a copy for an array that has masked elements,
+        # otherwise it returns the caller's data, so only copies are rounded in place
+        speed_copied = direction_copied = False
         if numpy.ma.is_masked(speed):
+            speed_copied = True
+            direction_copied = numpy.ma.is_masked(direction)
             speed = speed.filled(FILLVALUE)
             direction = direction.filled(FILLVALUE)
 
         # Format speed/direction
-        speed = numpy.round(speed, decimals=2)
-        direction = numpy.round(direction, decimals=1)
+        if speed_copied:
+            numpy.round(speed, decimals=2, out=speed)
+        else:
+            speed = numpy.round(speed, decimals=2)
+        if direction_copied:
+            numpy.round(direction, decimals=1, out=direction)
+        else:
+            direction = numpy.round(direction, decimals=1)
 
-        # Add speed/direction data
-        values = numpy.zeros(speed.shape, dtype=values_dtype)
+        # Add speed/direction data, reusing the compound buffer from the
+        # previous group when the grid shape is unchanged (the usual case)
+        values = self._values_buffer
+        if values is None or values.shape != speed.shape:
+            values = self._values_buffer = numpy.empty(speed.shape, dtype=VALUES_DTYPE)
         values['surfaceCurrentSpeed'] = speed
         values['surfaceCurrentDirection'] = direction
-        values_dset = feature_group.create_dataset('values', speed.shape, dtype=values_dtype, chunks=True, compression='gzip', compression_opts=9)
+        values_dset = feature_group.create_dataset('values', speed.shape, dtype=VALUES_DTYPE,
+                                                   chunks=_chunk_shape(speed.shape, VALUES_DTYPE.itemsize),
+                                                   compression='gzip', compression_opts=9)
         values_dset[...] = values
 
-        self.feature.attrs.create('dimension', speed.ndim, dtype=numpy.uint8)
+        # Every group in the file has the same number of dimensions and target
+        # depth, so these attributes are written once using the first group added
+        if first_group:
+            feature_attrs.create('dimension', speed.ndim, dtype=numpy.uint8)
 
-        # Update depth attribute
-        current_depth = (-abs(target_depth)) + 0
-        self.h5_file.attrs.create('surfaceCurrentDepth', current_depth, dtype=numpy.float32)
+            # Add depth attribute
+            current_depth = (-abs(target_depth)) + 0
+            self.h5_file.attrs.create('surfaceCurrentDepth', current_depth, dtype=numpy.float32)
 
-        # Update chunking attributes
-        chunking_str = ','.join(str(x) for x in values_dset.chunks)
+        # Gridded groups (data coding formats 2 and 3) share one shape and chunk
+        # layout, so their chunking attributes are written once. Time series
+        # groups (formats 1 and 4) are stations/observations whose lengths
+        # differ, so the chunking of the most recent group is kept
+        if first_group or self.data_coding_format not in (2, 3):
+            chunking_str = _chunking_to_str(values_dset.chunks)
 
-        self.groupF_dset.attrs.create('chunking', chunking_str, dtype=h5py.special_dtype(vlen=str))
-        self.feature_instance.attrs.create('instanceChunking', numpy.string_(chunking_str))
+            self.groupF_dset.attrs.create('chunking', chunking_str, dtype=VLEN_STR_DTYPE)
+            instance_attrs.create('instanceChunking', chunking_str)
 
     def add_positioning(self, longitude, latitude):
         """Add positioning group and data to the S111 file.
@@ -410,77 +515,89 @@ class S111File:
         """
 
         # Add longitude/latitude positioning
-        geometry_dtype = numpy.dtype([('longitude', numpy.float32), ('latitude', numpy.float32)])
         dim = len(longitude)
 
         # Create positioning group
         feature_positioning = self.feature_instance.create_group('Positioning')
 
         # Create lon/lat compound dataset
-        geometry = numpy.zeros((dim,), dtype=geometry_dtype)
+        geometry = numpy.empty((dim,), dtype=GEOMETRY_DTYPE)
         geometry['longitude'] = longitude
         geometry['latitude'] = latitude
-        geometry_dset = feature_positioning.create_dataset('geometryValues', (dim,), dtype=geometry_dtype,
-                                                           chunks=True, compression='gzip', compression_opts=9)
+        geometry_dset = feature_positioning.create_dataset('geometryValues', (dim,), dtype=GEOMETRY_DTYPE,
+                                                           chunks=_chunk_shape((dim,), GEOMETRY_DTYPE.itemsize),
+                                                           compression='gzip', compression_opts=9)
         geometry_dset[...] = geometry
 
         # X/Y coordinates are located at the center of each grid cell
-        min_lon = numpy.nanmin(longitude)
-        min_lat = numpy.nanmin(latitude)
-        max_lon = numpy.nanmax(longitude)
-        max_lat = numpy.nanmax(latitude)
-
-        min_lon = numpy.round(min_lon, 7)
-        max_lon = numpy.round(max_lon, 7)
-        min_lat = numpy.round(min_lat, 7)
-        max_lat = numpy.round(max_lat, 7)
-
-        # Update carrier metadata
-
-        self.h5_file.attrs.create('westBoundLongitude', min_lon, dtype=numpy.float32)
-        self.h5_file.attrs.create('eastBoundLongitude', max_lon, dtype=numpy.float32)
-        self.h5_file.attrs.create('southBoundLatitude', min_lat, dtype=numpy.float32)
-        self.h5_file.attrs.create('northBoundLatitude', max_lat, dtype=numpy.float32)
+        self._add_bounding_box(numpy.nanmin(longitude), numpy.nanmax(longitude),
+                               numpy.nanmin(latitude), numpy.nanmax(latitude))
+
         # Update feature container metadata
         self.feature.attrs.create('dimension', latitude.ndim, dtype=numpy.uint8)
-        # Update feature instance metadata
-        self.feature_instance.attrs.create('westBoundLongitude', min_lon, dtype=numpy.float32)
-        self.feature_instance.attrs.create('eastBoundLongitude', max_lon, dtype=numpy.float32)
-        self.feature_instance.attrs.create('southBoundLatitude', min_lat, dtype=numpy.float32)
-        self.feature_instance.attrs.create('northBoundLatitude', max_lat, dtype=numpy.float32)
+
+    def _add_bounding_box(self, min_lon, max_lon, min_lat, max_lat):
+        """Add bounding box attributes to the carrier and feature instance.
+
+        Args:
+            min_lon: Western bound longitude.
+            max_lon: Eastern bound longitude.
+            min_lat: Southern bound latitude.
+            max_lat: Northern bound latitude.
+
+        Returns:
+            Tuple of the bounds rounded to 7 decimal places, in argument order.
+        """
+        bounds = (
+            ('westBoundLongitude', numpy.round(min_lon, 7)),
+            ('eastBoundLongitude', numpy.round(max_lon, 7)),
+            ('southBoundLatitude', numpy.round(min_lat, 7)),
+            ('northBoundLatitude', numpy.round(max_lat, 7))
+        )
+        for attrs in (self.h5_file.attrs, self.feature_instance.attrs):
+            for name, value in bounds:
+                attrs.create(name, value, dtype=numpy.float32)
+
+        return tuple(value for name, value in bounds)
+
+    def _add_issuance(self):
+        """Add issue date and time attributes to the carrier, using the current time."""
+        now = datetime.datetime.now()
+        file_attrs = self.h5_file.attrs
+        file_attrs.create('issueTime', numpy.bytes_(now.strftime('%H%M%SZ')), dtype=VLEN_STR_DTYPE)
+        file_attrs.create('issueDate', numpy.bytes_(now.strftime('%Y%m%d')), dtype=VLEN_STR_DTYPE)
 
     def add_model_metadata(self):
         """Model specific metadata"""
 
         # Update feature container metadata
         self.feature.attrs.create('interpolationType', self.input_metadata.INTERPOLATION_TYPE['discrete'],
-                                  dtype=h5py.special_dtype(enum=(numpy.uint8, self.input_metadata.INTERPOLATION_TYPE)))
+                                  dtype=_enum_dtype(self.input_metadata.INTERPOLATION_TYPE))
 
-        # Update attributes after all the value groups have been added, 0-based
-        num_feature_instance_groups = len(self.feature_instance_groups) + 1
+        # Update attributes after all the value groups have been added
+        num_feature_instance_groups = len(self.feature_instance_groups)
         self.feature_instance.attrs.create('numGRP', num_feature_instance_groups, dtype=numpy.int32)
         self.feature_instance.attrs.create('numberOfTimes', num_feature_instance_groups, dtype=numpy.int32)
 
-        if self.h5_file.__contains__('/SurfaceCurrent/SurfaceCurrent.01/Group_002'):
-            first_time = datetime.datetime.strptime(
-                (self.h5_file['/SurfaceCurrent/SurfaceCurrent.01/Group_001'].attrs['timePoint']), '%Y%m%dT%H%M%SZ')
-            second_time = datetime.datetime.strptime(
-                (self.h5_file['/SurfaceCurrent/SurfaceCurrent.01/Group_002'].attrs['timePoint']), '%Y%m%dT%H%M%SZ')
+        if 'Group_002' in self.feature_instance_groups:
+            if len(self.group_datetimes) == num_feature_instance_groups:
+                # All groups were added through this instance, use their times directly
+                first_time, second_time = self.group_datetimes[:2]
+            else:
+                first_time = datetime.datetime.strptime(
+                    (self.feature_instance['Group_001'].attrs['timePoint']), DATETIME_FORMAT)
+                second_time = datetime.datetime.strptime(
+                    (self.feature_instance['Group_002'].attrs['timePoint']), DATETIME_FORMAT)
 
             time_interval_secs = (second_time - first_time).total_seconds()
             self.feature_instance.attrs.modify('timeRecordInterval', time_interval_secs)
 
         if self.data_coding_format == 3:
-            nodes = self.h5_file['/SurfaceCurrent/SurfaceCurrent.01/Group_001/values']
+            nodes = self.feature_instance['Group_001/values']
             num_nodes = nodes.shape[0]
             self.feature_instance.attrs.create('numberOfNodes', num_nodes, dtype=numpy.int32)
 
-        now = datetime.datetime.now()
-        issuance_time = now.strftime('%H%M%SZ')
-        issuance_date = now.strftime('%Y%m%d')
-
-        self.h5_file.attrs.create('issueTime', numpy.string_(issuance_time), dtype=h5py.special_dtype(vlen=str))
-        self.h5_file.attrs.create('issueDate', numpy.string_(issuance_date), dtype=h5py.special_dtype(vlen=str))
+        self._add_issuance()
 
     def add_time_series_metadata(self, datetime_values):
         """Time series specific metadata
@@ -488,13 +605,13 @@ class S111File:
         Args: datetime_values: List of datetime objects
         """
 
-        num_feature_instance_groups = len(self.feature_instance_groups) + 1
+        num_feature_instance_groups = len(self.feature_instance_groups)
         self.feature_instance.attrs.create('numGRP', num_feature_instance_groups, dtype=numpy.int32)
 
-        last_time_str = datetime_values[-1].strftime('%Y%m%dT%H%M%SZ')
+        last_time_str = datetime_values[-1].strftime(DATETIME_FORMAT)
 
         # Overwrite last date time record
-        self.feature_instance.attrs.modify('dateTimeOfLastRecord', numpy.string_(last_time_str))
+        self.feature_instance.attrs.modify('dateTimeOfLastRecord', numpy.bytes_(last_time_str))
 
         interval = datetime_values[1] - datetime_values[0]
         time_interval = interval.total_seconds()
@@ -504,12 +621,7 @@ class S111File:
         self.feature_instance.attrs.create('numberOfTimes', num_times, dtype=numpy.int32)
         self.feature_instance.attrs.create('numberOfStations', num_feature_instance_groups, dtype=numpy.int32)
 
-        now = datetime.datetime.now()
-        issuance_time = now.strftime('%H%M%SZ')
-        issuance_date = now.strftime('%Y%m%d')
-
-        self.h5_file.attrs.create('issueTime', numpy.string_(issuance_time), dtype=h5py.special_dtype(vlen=str))
-        self.h5_file.attrs.create('issueDate', numpy.string_(issuance_date), dtype=h5py.special_dtype(vlen=str))
+        self._add_issuance()
 
 
 class S111Metadata:
@@ -527,8 +639,9 @@ class S111Metadata:
     START_SEQUENCE: Starting location of the scan.
 
     """
-    PRODUCT_SPECIFICATION = numpy.string_('INT.IHO.S-111.1.0')
-    HORIZONTAL_DATUM_REFERENCE = numpy.string_('EPSG')
+
+    PRODUCT_SPECIFICATION = b'INT.IHO.S-111.1.0'
+    HORIZONTAL_DATUM_REFERENCE = b'EPSG'
     HORIZONTAL_DATUM_VALUE = 4326
     DATA_CODING_FORMAT = {'Time series at fixed stations': 1,
                           'Regularly-gridded arrays': 2,
@@ -562,8 +675,8 @@ class S111Metadata:
                             'Morton': 5,
                             'Hilbert': 6,
                             }
-    SEQUENCING_RULE_SCAN_DIRECTION = numpy.string_('longitude,latitude')
-    START_SEQUENCE = numpy.string_('0,0')
+    SEQUENCING_RULE_SCAN_DIRECTION = b'longitude,latitude'
+    START_SEQUENCE = b'0,0'
     VERTICAL_DATUM = {'meanLowWaterSprings': 1,
                       'meanLowerLowWaterSprings': 2,
                       'meanSeaLevel': 3,
@@ -624,6 +737,7 @@ class S111Metadata:
 
 class S111TimeSeries:
     """Contains prediction time series data to pass to S111File. """
+    __slots__ = ('longitude', 'latitude', 'speed', 'direction', 'datetime_values')
 
     def __init__(self, longitude, latitude, speed, direction, datetime_values):
         """Initializes S111TimeSeries object.
@@ -696,92 +810,120 @@ def model_to_s111(model_index_file, model_files, s111_path_prefix, cycletime, in
 
         try:
             model_index_file.open()
-            if model_index_file.dim_subgrid is not None and model_index_file.var_subgrid_id is not None:
-                # Output to subgrids
-                stack = contextlib.ExitStack()
-                s111_files = []
-                for i in range(model_index_file.dim_subgrid.size):
+
+            # Whether output is split into subgrids does not change between time steps
+            use_subgrids = model_index_file.dim_subgrid is not None and model_index_file.var_subgrid_id is not None
+            # Close every S111 file when done, including on error
+            with contextlib.ExitStack() as stack:
+                if use_subgrids:
+                    # Output to subgrids
+                    # (S111File, subgrid slices) pairs for the subgrid files still being written
+                    active_subgrids = []
+
+                    # Read subgrid identifiers and extents in bulk, rather than one
+                    # element (and one NetCDF read) at a time
                     if model_index_file.var_subgrid_name is not None:
-                        filename = '{}_{}.h5'.format(s111_path_prefix,
-                                                     model_index_file.var_subgrid_name[i])
+                        subgrid_labels = model_index_file.var_subgrid_name[:]
+                        filename_format = '{}_{}.h5'
                     else:
-                        filename = '{}_FID_{}.h5'.format(s111_path_prefix,
-                                                         model_index_file.var_subgrid_id[i])
-
-                    s111_file = S111File(filename, input_metadata, data_coding_format,
-                                         model_index_file, subgrid_index=i, clobber=True)
-
+                        subgrid_labels = model_index_file.var_subgrid_id[:]
+                        filename_format = '{}_FID_{}.h5'
+                    subgrid_x_min = model_index_file.var_subgrid_x_min[:]
+                    subgrid_x_max = model_index_file.var_subgrid_x_max[:]
+                    subgrid_y_min = model_index_file.var_subgrid_y_min[:]
+                    subgrid_y_max = model_index_file.var_subgrid_y_max[:]
+
+                    for i in range(model_index_file.dim_subgrid.size):
+                        filename = filename_format.format(s111_path_prefix, subgrid_labels[i])
+
+                        s111_file = S111File(filename, input_metadata, data_coding_format,
+                                             model_index_file, subgrid_index=i, clobber=True)
+
+                        s111_file_paths.append(s111_file.path)
+                        stack.enter_context(s111_file)
+
+                        # Subgrid extents are constant, look them up once rather than every time step
+                        subgrid_slices = (slice(subgrid_y_min[i], subgrid_y_max[i] + 1),
+                                          slice(subgrid_x_min[i], subgrid_x_max[i] + 1))
+                        active_subgrids.append((s111_file, subgrid_slices))
+
+                else:
+                    # Output entire domain
+                    s111_file = S111File('{}.h5'.format(s111_path_prefix), input_metadata, data_coding_format,
+                                         model_index_file, clobber=True)
                     s111_file_paths.append(s111_file.path)
                     stack.enter_context(s111_file)
-                    s111_files.append(s111_file)
-
-            else:
-                # Output entire domain
-                s111_file = S111File('{}.h5'.format(s111_path_prefix), input_metadata, data_coding_format,
-                                     model_index_file, clobber=True)
-                s111_file_paths.append(s111_file.path)
-
-            for model_file in model_files:
-                try:
-                    model_file.open()
-                    for time_index in range(len(model_file.datetime_values)):
-                        # Call model method and convert and interpolate u/v to regular grid
-                        # The water current at a specified target depth below the sea surface in meters the default
-                        # target depth is 4.5 meters, target interpolation depth must be greater or equal to 0.
-
-                        reg_grid_u, reg_grid_v = model_file.uv_to_regular_grid(model_index_file, time_index, target_depth)
-
-                        reg_grid_u = numpy.ma.masked_array(reg_grid_u, model_index_file.var_mask.mask)
-                        reg_grid_v = numpy.ma.masked_array(reg_grid_v, model_index_file.var_mask.mask)
-
-                        # Convert currents at regular grid points from u/v to speed/direction
-                        speed, direction = model.regular_uv_to_speed_direction(reg_grid_u, reg_grid_v)
-
-                        # Apply mask
-                        direction = numpy.ma.masked_array(direction, model_index_file.var_mask.mask)
-                        speed = numpy.ma.masked_array(speed, model_index_file.var_mask.mask)
-
-                        # If any valid data points fall outside of the scipy griddata convex hull
-                        # nan values will be used, if nan values are present
-                        # add nan values to the original mask
-                        if numpy.isnan(speed).any():
-
-                            nan_mask_speed = numpy.ma.masked_invalid(speed)
-                            nan_mask_direction = numpy.ma.masked_invalid(direction)
-                            speed_mask = numpy.ma.mask_or(model_index_file.var_mask.mask, nan_mask_speed.mask)
-                            direction_mask = numpy.ma.mask_or(model_index_file.var_mask.mask, nan_mask_direction.mask)
-
-                            speed = numpy.ma.masked_array(speed, speed_mask)
-                            direction = numpy.ma.masked_array(direction, direction_mask)
-
-                        if model_index_file.dim_subgrid is not None and model_index_file.var_subgrid_id is not None:
-                            # Output to subgrids
-                                for subgrid_index, s111_file in enumerate(s111_files):
-                                    if os.path.isfile(s111_file.path):
-                                        x_min = model_index_file.var_subgrid_x_min[subgrid_index]
-                                        x_max = model_index_file.var_subgrid_x_max[subgrid_index]
-                                        y_min = model_index_file.var_subgrid_y_min[subgrid_index]
-                                        y_max = model_index_file.var_subgrid_y_max[subgrid_index]
-                                        subgrid_speed = speed[y_min:y_max + 1, x_min:x_max + 1]
-                                        subgrid_direction = direction[y_min:y_max + 1, x_min:x_max + 1]
-                                        if numpy.ma.count(subgrid_speed) >= 20:
-                                            s111_file.add_feature_instance_group_data(
-                                                model_file.datetime_values[time_index], subgrid_speed,
-                                                subgrid_direction, cycletime, target_depth)
-                                            s111_file.add_model_metadata()
-
-                                        else:
-                                            s111_file.close()
-                                            os.remove('{}'.format(s111_file.path))
-                                            s111_file_paths.remove(s111_file.path)
-                        else:
-
-                            s111_file.add_feature_instance_group_data(model_file.datetime_values[time_index], speed,
-                                                                      direction, cycletime, target_depth)
-                            s111_file.add_model_metadata()
 
-                finally:
-                    model_file.close()
+                # Land/invalid mask is the same for every time step
+                index_mask = model_index_file.var_mask.mask
+
+                for model_file in model_files:
+                    # Every subgrid file has been discarded, no need to interpolate the remaining data
+                    if not s111_file_paths:
+                        break
+
+                    try:
+                        model_file.open()
+                        for time_index, datetime_value in enumerate(model_file.datetime_values):
+                            if not s111_file_paths:
+                                break
+
+                            # Call model method and convert and interpolate u/v to regular grid
+                            # The water current at a specified target depth below the sea surface in meters the default
+                            # target depth is 4.5 meters, target interpolation depth must be greater or equal to 0.
+
+                            reg_grid_u, reg_grid_v = model_file.uv_to_regular_grid(model_index_file, time_index, target_depth)
+
+                            reg_grid_u = numpy.ma.masked_array(reg_grid_u, index_mask)
+                            reg_grid_v = numpy.ma.masked_array(reg_grid_v, index_mask)
+
+                            # Convert currents at regular grid points from u/v to speed/direction
+                            speed, direction = model.regular_uv_to_speed_direction(reg_grid_u, reg_grid_v)
+
+                            # Apply mask
+                            # If any valid data points fall outside of the scipy griddata convex hull
+                            # nan values will be used, add them to the original mask in the same pass.
+                            # Speed and direction are both nan wherever u or v is nan, so one mask
+                            # covers both
+                            grid_mask = numpy.isnan(numpy.ma.getdata(speed))
+                            grid_mask |= index_mask
+                            speed = numpy.ma.masked_array(speed, grid_mask)
+                            direction = numpy.ma.masked_array(direction, grid_mask)
+
+                            if use_subgrids:
+                                # Output to subgrids, discarding (and no longer visiting) any subgrid
+                                # file with too few valid points
+                                for subgrid in tuple(active_subgrids):
+                                    s111_file, subgrid_slices = subgrid
+                                    subgrid_speed = speed[subgrid_slices]
+                                    subgrid_direction = direction[subgrid_slices]
+                                    if numpy.ma.count(subgrid_speed) >= 20:
+                                        s111_file.add_feature_instance_group_data(
+                                            datetime_value, subgrid_speed,
+                                            subgrid_direction, cycletime, target_depth)
+
+                                    else:
+                                        s111_file.close()
+                                        os.remove('{}'.format(s111_file.path))
+                                        s111_file_paths.remove(s111_file.path)
+                                        active_subgrids.remove(subgrid)
+                            else:
+
+                                s111_file.add_feature_instance_group_data(datetime_value, speed, direction,
+                                                                          cycletime, target_depth)
+
+                    finally:
+                        model_file.close()
+
+                # Update group count and time interval metadata once, after all data has been added,
+                # skipping files no data was added to (no model files or time steps)
+                if use_subgrids:
+                    output_files = [s111_file for s111_file, subgrid_slices in active_subgrids]
+                else:
+                    output_files = [s111_file]
+                for s111_file in output_files:
+                    if s111_file.feature_instance_groups:
+                        s111_file.add_model_metadata()
 
         finally:
             model_index_file.close()
@@ -793,7 +935,7 @@ def model_to_s111(model_index_file, model_files, s111_path_prefix, cycletime, in
             for model_file in model_files:
                 try:
                     model_file.open()
-                    for time_index in range(len(model_file.datetime_values)):
+                    for time_index, datetime_value in enumerate(model_file.datetime_values):
 
                         # Get native-grid output with invalid/masked values removed
                         u_compressed, v_compressed, lat_compressed, lon_compressed = model_file.output_native_grid(
@@ -802,8 +944,8 @@ def model_to_s111(model_index_file, model_files, s111_path_prefix, cycletime, in
                         # Convert currents from u/v to speed/direction
                         speed, direction = model.irregular_uv_to_speed_direction(u_compressed, v_compressed)
 
-                        s111_file.add_feature_instance_group_data(model_file.datetime_values[time_index], speed,
-                                                                  direction, cycletime, target_depth)
+                        s111_file.add_feature_instance_group_data(datetime_value, speed, direction,
+                                                                  cycletime, target_depth)
 
                 finally:
                     model_file.close()
@@ -843,22 +985,24 @@ def time_series_to_s111(input_data, s111_path_prefix, input_metadata, data_codin
     if os.path.isdir(s111_path_prefix):
         if not s111_path_prefix.endswith('/'):
             s111_path_prefix += '/'
-        file_issuance = datetime.datetime.strftime(timestamp, '%Y%m%dT%H%M%SZ')
+        file_issuance = datetime.datetime.strftime(timestamp, DATETIME_FORMAT)
         s111_path_prefix += (
             'S111{}_{}_{}_TYP{}'.format(input_metadata.producer_code, file_issuance, input_metadata.region, data_coding_format))
 
-        stations_longitude = []
-        stations_latitude = []
-
         with S111File('{}.h5'.format(s111_path_prefix), input_metadata, data_coding_format, clobber=True) as s111_file:
 
             if data_coding_format == 1:
-                for station in input_data:
+                # Collect station positions into contiguous coordinate arrays
+                stations_longitude = numpy.empty(len(input_data), dtype=numpy.float64)
+                stations_latitude = numpy.empty(len(input_data), dtype=numpy.float64)
+
+                for station_index, station in enumerate(input_data):
                     s111_file.add_feature_instance_group_data(station.datetime_values[0], station.speed,
                                                               station.direction, timestamp, current_depth)
 
-                    stations_longitude.append(station.longitude)
-                    stations_latitude.append(station.latitude)
+                    # Positions may be scalars or 1-element arrays
+                    stations_longitude[station_index] = numpy.asarray(station.longitude).item()
+                    stations_latitude[station_index] = numpy.asarray(station.latitude).item()
 
                 s111_file.add_positioning(stations_longitude, stations_latitude)
 
@@ -878,6 +1022,7 @@ def concatenate_s111(h5_files, output_path):
 
     Limitations:
         Specified h5_files must be S-111 type-2 files each containing a single hourly forecast.
+        Values datasets are copied with the chunking and compression of the input files.
 
     Args:
         h5_files: List of S111 `.h5` hourly forecasts files to concatenate.
@@ -888,55 +1033,47 @@ def concatenate_s111(h5_files, output_path):
     # Use the first forecast file as a template for the new S111 file
     f001 = shutil.copy(h5_files[0], output_path)
 
-    try:
-        output_file = h5py.File(f001, 'r+')
+    with h5py.File(f001, 'r+') as output_file:
+        output_feature = output_file['SurfaceCurrent']
+        output_feature_instance = output_feature['SurfaceCurrent.01']
+
         # Add data starting with the second forecast file(f002), use a starting index of 2
         for idx, path in enumerate(h5_files[1:], 2):
 
             # Create new group for each input_file
-            output_file['SurfaceCurrent/SurfaceCurrent.01'].create_group(f'Group_{idx:03d}')
+            output_group = output_feature_instance.create_group(f'Group_{idx:03d}')
             print(path)
 
             # Open and read input_file
-            try:
-                input_file = h5py.File(path, 'r')
+            with h5py.File(path, 'r') as input_file:
+                input_feature = input_file['SurfaceCurrent']
+                input_group = input_feature['SurfaceCurrent.01/Group_001']
 
-                data_shape = input_file['SurfaceCurrent/SurfaceCurrent.01/Group_001/values'].shape
-                time_str = input_file['/SurfaceCurrent/SurfaceCurrent.01/Group_001'].attrs['timePoint']
+                time_str = input_group.attrs['timePoint']
 
                 if idx == 2:
                     first_time = datetime.datetime.strptime(
-                        (output_file['/SurfaceCurrent/SurfaceCurrent.01/Group_001'].attrs['timePoint']), '%Y%m%dT%H%M%SZ')
-                    second_time = datetime.datetime.strptime(
-                        (input_file['/SurfaceCurrent/SurfaceCurrent.01/Group_001'].attrs['timePoint']), '%Y%m%dT%H%M%SZ')
+                        (output_feature_instance['Group_001'].attrs['timePoint']), DATETIME_FORMAT)
+                    second_time = datetime.datetime.strptime(time_str, DATETIME_FORMAT)
 
                     time_interval_secs = (second_time - first_time).total_seconds()
-                    output_file['SurfaceCurrent/SurfaceCurrent.01'].attrs.modify('timeRecordInterval', time_interval_secs)
+                    output_feature_instance.attrs.modify('timeRecordInterval', time_interval_secs)
 
-                output_file['SurfaceCurrent/SurfaceCurrent.01'].attrs.modify('dateTimeOfLastRecord', numpy.string_(time_str))
-                output_file[f'SurfaceCurrent/SurfaceCurrent.01/Group_{idx:03d}'].attrs.create('timePoint', numpy.string_(time_str), None, h5py.special_dtype(vlen=str))
+                output_feature_instance.attrs.modify('dateTimeOfLastRecord', numpy.bytes_(time_str))
+                output_group.attrs.create('timePoint', numpy.bytes_(time_str), None, VLEN_STR_DTYPE)
 
                 # If the input_file has a lower minimum speed use the input_file minDatasetCurrentSpeed speed value
-                if input_file['SurfaceCurrent'].attrs['minDatasetCurrentSpeed'] < output_file['SurfaceCurrent'].attrs['minDatasetCurrentSpeed']:
-                    output_file['SurfaceCurrent'].attrs.modify('minDatasetCurrentSpeed', input_file['SurfaceCurrent'].attrs['minDatasetCurrentSpeed'])
+                if input_feature.attrs['minDatasetCurrentSpeed'] < output_feature.attrs['minDatasetCurrentSpeed']:
+                    output_feature.attrs.modify('minDatasetCurrentSpeed', input_feature.attrs['minDatasetCurrentSpeed'])
 
                 # If the input_file has a greater maximum speed use the input_file maxDatasetCurrentSpeed speed value
-                if input_file['SurfaceCurrent'].attrs['maxDatasetCurrentSpeed'] > output_file['SurfaceCurrent'].attrs['maxDatasetCurrentSpeed']:
-                    output_file['SurfaceCurrent'].attrs.modify('maxDatasetCurrentSpeed', input_file['SurfaceCurrent'].attrs['maxDatasetCurrentSpeed'])
-
-                output_file['SurfaceCurrent/SurfaceCurrent.01'].attrs.modify('numGRP', idx)
-                output_file['SurfaceCurrent/SurfaceCurrent.01'].attrs.modify('numberOfTimes', idx)
-
-                # Add each input file's compound dataset containing spd/dir values to the output file
-                values_dtype = numpy.dtype([('surfaceCurrentSpeed', numpy.float32), ('surfaceCurrentDirection', numpy.float32)])
-                values = numpy.zeros(data_shape, dtype=values_dtype)
-                values['surfaceCurrentSpeed'] = input_file['SurfaceCurrent/SurfaceCurrent.01/Group_001/values']['surfaceCurrentSpeed']
-                values['surfaceCurrentDirection'] = input_file['SurfaceCurrent/SurfaceCurrent.01/Group_001/values']['surfaceCurrentDirection']
-                values_dset = output_file[f'SurfaceCurrent/SurfaceCurrent.01/Group_{idx:03d}'].create_dataset('values', data_shape, dtype=values_dtype, chunks=True, compression='gzip', compression_opts=9)
-                values_dset[...] = values
-            finally:
-                input_file.close()
-
-    finally:
-        output_file.close()
+                if input_feature.attrs['maxDatasetCurrentSpeed'] > output_feature.attrs['maxDatasetCurrentSpeed']:
+                    output_feature.attrs.modify('maxDatasetCurrentSpeed', input_feature.attrs['maxDatasetCurrentSpeed'])
+
+                output_feature_instance.attrs.modify('numGRP', idx)
+                output_feature_instance.attrs.modify('numberOfTimes', idx)
+
+                # Copy each input file's compound dataset containing spd/dir values to the output file,
+                # the compressed chunks are copied as stored without being decompressed and recompressed
+                input_group.copy('values', output_group)
 